@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, DeleteMany
 import os
 import logging
 from pathlib import Path
@@ -12,6 +14,11 @@ import uuid
 from datetime import datetime, timezone
 import base64
 import shutil
+import asyncio
+import ipaddress
+import json
+import re
+import zipfile
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -30,6 +37,145 @@ PROPERTY_PHOTOS_DIR = UPLOADS_DIR / 'property_photos'
 for directory in [UPLOADS_DIR, PHOTOS_DIR, DOCUMENTS_DIR, PROPERTY_PHOTOS_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
+# Inventory storage modes: "embedded" keeps rooms/items/photos inside the
+# inventory document, "normalized" keeps them in their own collections
+EMBEDDED_STORAGE = "embedded"
+NORMALIZED_STORAGE = "normalized"
+STORAGE_MODES = {EMBEDDED_STORAGE, NORMALIZED_STORAGE}
+DEFAULT_STORAGE_MODE = os.environ.get('INVENTORY_STORAGE_MODE', EMBEDDED_STORAGE)
+if DEFAULT_STORAGE_MODE not in STORAGE_MODES:
+    raise ValueError(f"INVENTORY_STORAGE_MODE must be one of {sorted(STORAGE_MODES)}, got {DEFAULT_STORAGE_MODE!r}")
+
+# Upload admission control (all limits configurable via environment)
+UPLOAD_PATH_PREFIX = "/api/upload/"
+UPLOAD_STATUS_PATH = "/api/status/uploads"
+UPLOAD_MAX_CONCURRENT = int(os.environ.get('UPLOAD_MAX_CONCURRENT', '4'))
+UPLOAD_MAX_CONCURRENT_BUSY = int(os.environ.get('UPLOAD_MAX_CONCURRENT_BUSY', '1'))  # while read/edit traffic is in flight
+UPLOAD_MAX_PER_CLIENT = int(os.environ.get('UPLOAD_MAX_PER_CLIENT', '2'))
+UPLOAD_MAX_QUEUE = int(os.environ.get('UPLOAD_MAX_QUEUE', '32'))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(25 * 1024 * 1024)))
+UPLOAD_RETRY_AFTER = int(os.environ.get('UPLOAD_RETRY_AFTER', '5'))  # seconds
+UPLOAD_QUEUE_TIMEOUT = float(os.environ.get('UPLOAD_QUEUE_TIMEOUT', '30'))  # seconds
+# Comma-separated IPs/CIDRs of proxies (e.g. the ingress) whose right-most
+# X-Forwarded-For entry identifies the upload client. Defaults to loopback and
+# private ranges so in-cluster ingress pods are trusted whatever their IP; set
+# it to an empty string when the app is exposed directly.
+UPLOAD_TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in os.environ.get(
+        'UPLOAD_TRUSTED_PROXIES', '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7'
+    ).split(',')
+    if network.strip()
+]
+
+class UploadAdmission:
+    """Bounded, low-priority admission for upload requests.
+
+    Uploads wait for a slot in a global pool; while interactive (non-upload)
+    API requests are in flight the pool shrinks to UPLOAD_MAX_CONCURRENT_BUSY
+    so reads and edits are not starved of disk I/O.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.queued = 0
+        self.interactive = 0
+        self.per_client: Dict[str, int] = {}
+        self.condition = asyncio.Condition()
+
+    def limit(self) -> int:
+        if self.interactive > 0:
+            return max(1, min(UPLOAD_MAX_CONCURRENT_BUSY, UPLOAD_MAX_CONCURRENT))
+        return max(1, UPLOAD_MAX_CONCURRENT)
+
+    def rejection(self, client_id: str) -> Optional[str]:
+        if self.per_client.get(client_id, 0) >= UPLOAD_MAX_PER_CLIENT:
+            return "Too many concurrent uploads from this client"
+        if self.queued >= UPLOAD_MAX_QUEUE:
+            return "Upload queue is full"
+        return None
+
+    async def acquire(self, client_id: str) -> bool:
+        """Wait up to UPLOAD_QUEUE_TIMEOUT for a slot; False if none freed up."""
+        self.per_client[client_id] = self.per_client.get(client_id, 0) + 1
+        self.queued += 1
+        try:
+            async with self.condition:
+                await asyncio.wait_for(
+                    self.condition.wait_for(lambda: self.active < self.limit()),
+                    UPLOAD_QUEUE_TIMEOUT,
+                )
+                self.active += 1
+            return True
+        except asyncio.TimeoutError:
+            self._drop_client(client_id)
+            return False
+        except BaseException:
+            self._drop_client(client_id)
+            raise
+        finally:
+            self.queued -= 1
+
+    async def release(self, client_id: str):
+        self._drop_client(client_id)
+        async with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    async def interactive_started(self):
+        self.interactive += 1
+
+    async def interactive_finished(self):
+        async with self.condition:
+            self.interactive -= 1
+            self.condition.notify_all()
+
+    def _drop_client(self, client_id: str):
+        remaining = self.per_client.get(client_id, 0) - 1
+        if remaining > 0:
+            self.per_client[client_id] = remaining
+        else:
+            self.per_client.pop(client_id, None)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "interactive_in_flight": self.interactive,
+            "current_limit": self.limit(),
+            "max_concurrent": UPLOAD_MAX_CONCURRENT,
+            "max_per_client": UPLOAD_MAX_PER_CLIENT,
+            "max_queue": UPLOAD_MAX_QUEUE,
+            "max_bytes": UPLOAD_MAX_BYTES,
+        }
+
+upload_admission = UploadAdmission()
+
+def is_trusted_proxy(peer: str) -> bool:
+    try:
+        address = ipaddress.ip_address(peer)
+    except ValueError:
+        return False
+    return any(address in network for network in UPLOAD_TRUSTED_PROXIES)
+
+def get_client_id(request: Request) -> str:
+    peer = request.client.host if request.client else "unknown"
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for and is_trusted_proxy(peer):
+        # The right-most entry is the one our proxy appended; earlier ones are client-supplied
+        return forwarded_for.split(",")[-1].strip() or peer
+    return peer
+
+def upload_rejected(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={
+            "Retry-After": str(UPLOAD_RETRY_AFTER),
+            "X-Upload-Queue-Depth": str(upload_admission.queued),
+        },
+    )
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -111,6 +257,8 @@ class Inventory(BaseModel):
     status: str = "draft"  # draft, sent, signed, archived
     shareable_link: Optional[str] = None
     signature: Optional[Signature] = None
+    storage_mode: str = EMBEDDED_STORAGE
+    room_count: Optional[int] = None  # Only set on summary listings, where rooms are omitted
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
@@ -118,6 +266,7 @@ class InventoryCreate(BaseModel):
     property_overview: PropertyOverview
     health_safety: HealthSafety = HealthSafety()
     rooms: List[Room] = []
+    storage_mode: Optional[str] = None  # Defaults to INVENTORY_STORAGE_MODE
 
 class InventoryUpdate(BaseModel):
     property_overview: Optional[PropertyOverview] = None
@@ -125,6 +274,40 @@ class InventoryUpdate(BaseModel):
     rooms: Optional[List[Room]] = None
     status: Optional[str] = None
 
+class RoomSummary(BaseModel):
+    position: int
+    room_name: str
+    item_count: int = 0
+
+class StorageModeUpdate(BaseModel):
+    storage_mode: str
+
+class InventoryTemplate(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    description: str = ""
+    property_overview: Optional[PropertyOverview] = None
+    health_safety: HealthSafety = HealthSafety()
+    rooms: List[Room] = []
+    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+class TemplateCreate(BaseModel):
+    name: str
+    description: str = ""
+    source_inventory_id: Optional[str] = None  # Copy structure from an existing inventory
+    property_overview: Optional[PropertyOverview] = None
+    health_safety: HealthSafety = HealthSafety()
+    rooms: List[Room] = []
+
+class InventoryClone(BaseModel):
+    source_inventory_id: Optional[str] = None
+    template_id: Optional[str] = None
+    property_overview: Optional[PropertyOverview] = None  # Overrides the source overview
+    photo_mode: str = "reference"  # reference, hardlink, none; applies to photos and compliance documents
+    storage_mode: Optional[str] = None
+
 class SignatureSubmit(BaseModel):
     signer_name: str
     signer_role: str  # "Inspector" or "Tenant"
@@ -133,6 +316,201 @@ class SignatureSubmit(BaseModel):
     email: str = ""
     tenant_present: Optional[bool] = None
 
+# Normalized inventory storage
+def split_room(inventory_id: str, position: int, room: Dict[str, Any]):
+    room_doc = {
+        "inventory_id": inventory_id,
+        "position": position,
+        "room_name": room["room_name"],
+        "general_notes": room.get("general_notes", ""),
+    }
+    item_docs = [
+        {**item, "inventory_id": inventory_id, "room_position": position, "position": item_position}
+        for item_position, item in enumerate(room.get("items", []))
+    ]
+    return room_doc, item_docs
+
+# Children are upserted by position and only surplus positions are deleted
+# afterwards, so overlapping saves never collide on the unique indexes and a
+# failed save never leaves an inventory without its rooms.
+def upsert_by_position(doc: Dict[str, Any], *keys: str) -> ReplaceOne:
+    return ReplaceOne({key: doc[key] for key in keys}, doc, upsert=True)
+
+def item_writes(inventory_id: str, position: int, item_docs: List[Dict[str, Any]]) -> list:
+    return [upsert_by_position(item, "inventory_id", "room_position", "position") for item in item_docs] + [
+        DeleteMany({"inventory_id": inventory_id, "room_position": position, "position": {"$gte": len(item_docs)}})
+    ]
+
+async def replace_normalized_rooms(inventory_id: str, rooms: List[Dict[str, Any]]):
+    room_writes, items = [], []
+    for position, room in enumerate(rooms):
+        room_doc, item_docs = split_room(inventory_id, position, room)
+        room_writes.append(upsert_by_position(room_doc, "inventory_id", "position"))
+        items.extend(item_writes(inventory_id, position, item_docs))
+    items.append(DeleteMany({"inventory_id": inventory_id, "room_position": {"$gte": len(rooms)}}))
+    room_writes.append(DeleteMany({"inventory_id": inventory_id, "position": {"$gte": len(rooms)}}))
+
+    await db.inventory_items.bulk_write(items, ordered=True)
+    await db.inventory_rooms.bulk_write(room_writes, ordered=True)
+
+async def replace_normalized_room(inventory_id: str, position: int, room: Dict[str, Any]):
+    room_doc, item_docs = split_room(inventory_id, position, room)
+    await db.inventory_items.bulk_write(item_writes(inventory_id, position, item_docs), ordered=True)
+    await db.inventory_rooms.replace_one({"inventory_id": inventory_id, "position": position}, room_doc)
+
+async def replace_normalized_photos(inventory_id: str, photos: List[Dict[str, Any]]):
+    writes = [
+        upsert_by_position({**photo, "inventory_id": inventory_id, "position": position}, "inventory_id", "position")
+        for position, photo in enumerate(photos)
+    ]
+    writes.append(DeleteMany({"inventory_id": inventory_id, "position": {"$gte": len(photos)}}))
+    await db.inventory_photos.bulk_write(writes, ordered=True)
+
+async def delete_normalized_children(inventory_id: str):
+    await db.inventory_rooms.delete_many({"inventory_id": inventory_id})
+    await db.inventory_items.delete_many({"inventory_id": inventory_id})
+    await db.inventory_photos.delete_many({"inventory_id": inventory_id})
+
+async def attach_normalized_children(inventories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill rooms and photo_vault for normalized inventories, batched across the list."""
+    normalized = {inv["id"]: inv for inv in inventories if inv.get("storage_mode") == NORMALIZED_STORAGE}
+    if not normalized:
+        return inventories
+
+    query = {"inventory_id": {"$in": list(normalized)}}
+    projection = {"_id": 0}
+    rooms = await db.inventory_rooms.find(query, projection).sort([("inventory_id", 1), ("position", 1)]).to_list(None)
+    items = await db.inventory_items.find(query, projection).sort(
+        [("inventory_id", 1), ("room_position", 1), ("position", 1)]
+    ).to_list(None)
+    photos = await db.inventory_photos.find(query, projection).sort([("inventory_id", 1), ("position", 1)]).to_list(None)
+
+    items_by_room: Dict[tuple, List[Dict[str, Any]]] = {}
+    for item in items:
+        key = (item.pop("inventory_id"), item.pop("room_position"))
+        item.pop("position", None)
+        items_by_room.setdefault(key, []).append(item)
+
+    for inventory in normalized.values():
+        inventory["rooms"] = []
+        inventory["photo_vault"] = []
+    for room in rooms:
+        inventory_id = room.pop("inventory_id")
+        position = room.pop("position")
+        room["items"] = items_by_room.get((inventory_id, position), [])
+        normalized[inventory_id]["rooms"].append(room)
+    for photo in photos:
+        photo.pop("position", None)
+        normalized[photo.pop("inventory_id")]["photo_vault"].append(photo)
+
+    return inventories
+
+async def load_inventory(query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    inventory = await db.inventories.find_one(query, {"_id": 0})
+    if inventory:
+        await attach_normalized_children([inventory])
+    return inventory
+
+def storage_mode_filter(inventory_id: str, storage_mode: Optional[str]) -> Dict[str, Any]:
+    """Match the inventory only while it is still stored the way the caller read it."""
+    if storage_mode == NORMALIZED_STORAGE:
+        return {"id": inventory_id, "storage_mode": NORMALIZED_STORAGE}
+    return {"id": inventory_id, "storage_mode": {"$ne": NORMALIZED_STORAGE}}
+
+def storage_conflict() -> HTTPException:
+    return HTTPException(status_code=409, detail="Inventory storage changed during the update; please retry")
+
+def ensure_unlocked(inventory: Dict[str, Any]):
+    if inventory.get("signature") and inventory["signature"].get("is_locked"):
+        raise HTTPException(status_code=403, detail="Cannot modify signed inventory")
+
+# Cloning
+PHOTO_MODES = {"reference", "hardlink", "none"}
+
+def map_file_paths(structure: Dict[str, Any], mapper):
+    """Rewrite every photo and compliance document reference in place.
+
+    ``mapper`` returns the new path, or None to drop the file.
+    """
+    overview = structure.get("property_overview") or {}
+    if "property_photos" in overview:
+        overview["property_photos"] = [p for p in map(mapper, overview["property_photos"]) if p]
+
+    health_safety = structure.get("health_safety") or {}
+    for entry in health_safety.get("meters", []) + health_safety.get("safety_items", []):
+        if entry.get("photo"):
+            entry["photo"] = mapper(entry["photo"])
+    if "compliance_documents" in health_safety:
+        health_safety["compliance_documents"] = [p for p in map(mapper, health_safety["compliance_documents"]) if p]
+
+    for room in structure.get("rooms", []):
+        for item in room.get("items", []):
+            item["photos"] = [p for p in map(mapper, item.get("photos", [])) if p]
+
+    photo_vault = []
+    for photo in structure.get("photo_vault", []):
+        photo["file_path"] = mapper(photo["file_path"])
+        if photo["file_path"]:
+            photo_vault.append(photo)
+    structure["photo_vault"] = photo_vault
+
+def hardlink_file_paths(structure: Dict[str, Any]):
+    """Give the clone its own directory entries for its files without copying bytes.
+
+    Falls back to sharing the original reference when the file is missing or
+    the filesystem does not support hard links.
+    """
+    linked: Dict[str, str] = {}
+
+    def link(file_path: str) -> str:
+        if file_path in linked:
+            return linked[file_path]
+        source = resolve_upload_path(file_path)
+        new_path = file_path
+        if source is not None:
+            target = source.with_name(f"{uuid.uuid4()}{source.suffix}")
+            try:
+                os.link(source, target)
+                new_path = f"/uploads/{source.parent.name}/{target.name}"
+            except OSError:
+                pass
+        linked[file_path] = new_path
+        return new_path
+
+    map_file_paths(structure, link)
+
+def clone_structure(source: Dict[str, Any]) -> Dict[str, Any]:
+    """Reusable structure of an inventory or template.
+
+    Per-inspection state (status, signatures, alarm checks, tenants and
+    inspection date) is left behind.
+    """
+    health_safety = source.get("health_safety") or {}
+    overview = source.get("property_overview")
+    if overview:
+        overview = {**overview, "tenant_names": [], "inspection_date": ""}
+    return {
+        "property_overview": overview,
+        "health_safety": {
+            "meters": health_safety.get("meters", []),
+            "safety_items": health_safety.get("safety_items", []),
+            "compliance_documents": health_safety.get("compliance_documents", []),
+        },
+        "rooms": source.get("rooms", []),
+        "photo_vault": source.get("photo_vault", []),
+    }
+
+async def insert_inventory(inventory: Inventory):
+    doc = inventory.model_dump()
+    if inventory.storage_mode == NORMALIZED_STORAGE:
+        # Children first: a failure part-way leaves unreferenced rows, never
+        # a visible inventory with its rooms missing
+        await replace_normalized_rooms(inventory.id, doc.pop("rooms"))
+        await replace_normalized_photos(inventory.id, doc.pop("photo_vault"))
+        await db.inventories.insert_one(doc)
+    else:
+        await db.inventories.insert_one(doc)
+
 # API Routes
 @api_router.get("/")
 async def root():
@@ -141,19 +519,47 @@ async def root():
 # Inventory CRUD
 @api_router.post("/inventories", response_model=Inventory)
 async def create_inventory(inventory_data: InventoryCreate):
-    inventory = Inventory(**inventory_data.model_dump())
-    doc = inventory.model_dump()
-    await db.inventories.insert_one(doc)
+    storage_mode = inventory_data.storage_mode or DEFAULT_STORAGE_MODE
+    if storage_mode not in STORAGE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown storage mode: {storage_mode}")
+
+    inventory = Inventory(**inventory_data.model_dump(exclude={"storage_mode"}), storage_mode=storage_mode)
+    await insert_inventory(inventory)
     return inventory
 
 @api_router.get("/inventories", response_model=List[Inventory])
-async def get_inventories():
-    inventories = await db.inventories.find({}, {"_id": 0}).to_list(1000)
+async def get_inventories(summary: bool = False):
+    """List inventories.
+
+    With ``?summary=true`` rooms and photo_vault are left empty and room_count
+    is filled in instead, so large (especially normalized) inventories do not
+    have to be assembled just to be listed. Fetch a single inventory, or its
+    rooms, for the full content.
+    """
+    if not summary:
+        inventories = await db.inventories.find({}, {"_id": 0}).to_list(1000)
+        return await attach_normalized_children(inventories)
+    
+    inventories = await db.inventories.aggregate([
+        {"$limit": 1000},
+        {"$addFields": {"room_count": {"$size": {"$ifNull": ["$rooms", []]}}}},
+        {"$project": {"_id": 0, "rooms": 0, "photo_vault": 0}},
+    ]).to_list(None)
+    normalized_ids = [inv["id"] for inv in inventories if inv.get("storage_mode") == NORMALIZED_STORAGE]
+    if normalized_ids:
+        counts = await db.inventory_rooms.aggregate([
+            {"$match": {"inventory_id": {"$in": normalized_ids}}},
+            {"$group": {"_id": "$inventory_id", "count": {"$sum": 1}}},
+        ]).to_list(None)
+        room_counts = {entry["_id"]: entry["count"] for entry in counts}
+        for inventory in inventories:
+            if inventory.get("storage_mode") == NORMALIZED_STORAGE:
+                inventory["room_count"] = room_counts.get(inventory["id"], 0)
     return inventories
 
 @api_router.get("/inventories/{inventory_id}", response_model=Inventory)
 async def get_inventory(inventory_id: str):
-    inventory = await db.inventories.find_one({"id": inventory_id}, {"_id": 0})
+    inventory = await load_inventory({"id": inventory_id})
     if not inventory:
         raise HTTPException(status_code=404, detail="Inventory not found")
     return inventory
@@ -165,27 +571,234 @@ async def update_inventory(inventory_id: str, update_data: InventoryUpdate):
         raise HTTPException(status_code=404, detail="Inventory not found")
     
     # Check if locked (signed)
-    if inventory.get("signature") and inventory["signature"].get("is_locked"):
-        raise HTTPException(status_code=403, detail="Cannot modify signed inventory")
+    ensure_unlocked(inventory)
     
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
     update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
     
-    await db.inventories.update_one(
-        {"id": inventory_id},
+    # Normalized rows are written first; the conditional write below then fails
+    # if a storage migration flipped the inventory in the meantime
+    storage_mode = inventory.get("storage_mode")
+    if storage_mode == NORMALIZED_STORAGE and "rooms" in update_dict:
+        await replace_normalized_rooms(inventory_id, update_dict.pop("rooms"))
+    
+    result = await db.inventories.update_one(
+        storage_mode_filter(inventory_id, storage_mode),
         {"$set": update_dict}
     )
+    if result.matched_count == 0:
+        raise storage_conflict()
     
-    updated_inventory = await db.inventories.find_one({"id": inventory_id}, {"_id": 0})
+    updated_inventory = await load_inventory({"id": inventory_id})
     return updated_inventory
 
+@api_router.put("/inventories/{inventory_id}/storage", response_model=Inventory)
+async def change_storage_mode(inventory_id: str, storage_update: StorageModeUpdate):
+    storage_mode = storage_update.storage_mode
+    if storage_mode not in STORAGE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown storage mode: {storage_mode}")
+    
+    inventory = await load_inventory({"id": inventory_id})
+    if not inventory:
+        raise HTTPException(status_code=404, detail="Inventory not found")
+    
+    current_mode = inventory.get("storage_mode", EMBEDDED_STORAGE)
+    if current_mode == storage_mode:
+        return inventory
+    
+    # Copy into the target layout, then flip storage_mode only if nothing was
+    # written since the snapshot: every edit bumps updated_at, so a matching
+    # updated_at means the copy is current. Otherwise report a conflict rather
+    # than drop the edit.
+    rooms = inventory.get("rooms", [])
+    photos = inventory.get("photo_vault", [])
+    pending = {**storage_mode_filter(inventory_id, current_mode), "updated_at": inventory.get("updated_at")}
+    if storage_mode == NORMALIZED_STORAGE:
+        await replace_normalized_rooms(inventory_id, rooms)
+        await replace_normalized_photos(inventory_id, photos)
+        result = await db.inventories.update_one(
+            pending,
+            {"$set": {"storage_mode": storage_mode}, "$unset": {"rooms": "", "photo_vault": ""}}
+        )
+        if result.matched_count == 0:
+            if await db.inventories.find_one(storage_mode_filter(inventory_id, current_mode), {"_id": 1}):
+                await delete_normalized_children(inventory_id)
+            raise storage_conflict()
+    else:
+        result = await db.inventories.update_one(
+            pending,
+            {"$set": {"storage_mode": storage_mode, "rooms": rooms, "photo_vault": photos}}
+        )
+        if result.matched_count == 0:
+            raise storage_conflict()
+        await delete_normalized_children(inventory_id)
+    
+    return await load_inventory({"id": inventory_id})
+
+# Lazy per-room access for large inventories
+@api_router.get("/inventories/{inventory_id}/rooms", response_model=List[RoomSummary])
+async def get_inventory_rooms(inventory_id: str):
+    inventory = await db.inventories.find_one(
+        {"id": inventory_id}, {"_id": 0, "storage_mode": 1, "rooms.room_name": 1, "rooms.items.item_name": 1}
+    )
+    if not inventory:
+        raise HTTPException(status_code=404, detail="Inventory not found")
+    
+    if inventory.get("storage_mode") != NORMALIZED_STORAGE:
+        return [
+            {"position": position, "room_name": room["room_name"], "item_count": len(room.get("items", []))}
+            for position, room in enumerate(inventory.get("rooms", []))
+        ]
+    
+    rooms = await db.inventory_rooms.find(
+        {"inventory_id": inventory_id}, {"_id": 0, "position": 1, "room_name": 1}
+    ).sort("position", 1).to_list(None)
+    counts = await db.inventory_items.aggregate([
+        {"$match": {"inventory_id": inventory_id}},
+        {"$group": {"_id": "$room_position", "count": {"$sum": 1}}},
+    ]).to_list(None)
+    item_counts = {entry["_id"]: entry["count"] for entry in counts}
+    return [{**room, "item_count": item_counts.get(room["position"], 0)} for room in rooms]
+
+@api_router.get("/inventories/{inventory_id}/rooms/{position}", response_model=Room)
+async def get_inventory_room(inventory_id: str, position: int):
+    if position < 0:
+        raise HTTPException(status_code=404, detail="Room not found")
+    inventory = await db.inventories.find_one(
+        {"id": inventory_id}, {"_id": 0, "storage_mode": 1, "rooms": {"$slice": [position, 1]}}
+    )
+    if not inventory:
+        raise HTTPException(status_code=404, detail="Inventory not found")
+    
+    if inventory.get("storage_mode") != NORMALIZED_STORAGE:
+        if not inventory.get("rooms"):
+            raise HTTPException(status_code=404, detail="Room not found")
+        return inventory["rooms"][0]
+    
+    room = await db.inventory_rooms.find_one({"inventory_id": inventory_id, "position": position}, {"_id": 0})
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    room["items"] = await db.inventory_items.find(
+        {"inventory_id": inventory_id, "room_position": position},
+        {"_id": 0, "inventory_id": 0, "room_position": 0, "position": 0}
+    ).sort("position", 1).to_list(None)
+    return room
+
+@api_router.put("/inventories/{inventory_id}/rooms/{position}", response_model=Room)
+async def update_inventory_room(inventory_id: str, position: int, room: Room):
+    if position < 0:
+        raise HTTPException(status_code=404, detail="Room not found")
+    inventory = await db.inventories.find_one(
+        {"id": inventory_id}, {"_id": 0, "storage_mode": 1, "signature": 1, "rooms": {"$slice": [position, 1]}}
+    )
+    if not inventory:
+        raise HTTPException(status_code=404, detail="Inventory not found")
+    ensure_unlocked(inventory)
+    
+    room_doc = room.model_dump()
+    storage_mode = inventory.get("storage_mode")
+    update = {"updated_at": datetime.now(timezone.utc).isoformat()}
+    if storage_mode == NORMALIZED_STORAGE:
+        if not await db.inventory_rooms.find_one({"inventory_id": inventory_id, "position": position}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Room not found")
+        await replace_normalized_room(inventory_id, position, room_doc)
+    else:
+        if not inventory.get("rooms"):
+            raise HTTPException(status_code=404, detail="Room not found")
+        update[f"rooms.{position}"] = room_doc
+    
+    result = await db.inventories.update_one(storage_mode_filter(inventory_id, storage_mode), {"$set": update})
+    if result.matched_count == 0:
+        raise storage_conflict()
+    
+    return room
+
 @api_router.delete("/inventories/{inventory_id}")
 async def delete_inventory(inventory_id: str):
     result = await db.inventories.delete_one({"id": inventory_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Inventory not found")
+    await delete_normalized_children(inventory_id)
     return {"message": "Inventory deleted successfully"}
 
+# Clone inventory
+@api_router.post("/inventories/clone", response_model=Inventory)
+async def clone_inventory(clone_data: InventoryClone):
+    if bool(clone_data.source_inventory_id) == bool(clone_data.template_id):
+        raise HTTPException(status_code=400, detail="Provide exactly one of source_inventory_id or template_id")
+    if clone_data.photo_mode not in PHOTO_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown photo mode: {clone_data.photo_mode}")
+    
+    if clone_data.source_inventory_id:
+        source = await load_inventory({"id": clone_data.source_inventory_id})
+        if not source:
+            raise HTTPException(status_code=404, detail="Inventory not found")
+    else:
+        source = await db.inventory_templates.find_one({"id": clone_data.template_id}, {"_id": 0})
+        if not source:
+            raise HTTPException(status_code=404, detail="Template not found")
+    
+    storage_mode = clone_data.storage_mode or source.get("storage_mode") or DEFAULT_STORAGE_MODE
+    if storage_mode not in STORAGE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown storage mode: {storage_mode}")
+    
+    structure = clone_structure(source)
+    if clone_data.property_overview:
+        structure["property_overview"] = clone_data.property_overview.model_dump()
+    if not structure["property_overview"]:
+        raise HTTPException(status_code=400, detail="property_overview is required when the template has none")
+    
+    if clone_data.photo_mode == "none":
+        map_file_paths(structure, lambda file_path: None)
+    elif clone_data.photo_mode == "hardlink":
+        await run_in_threadpool(hardlink_file_paths, structure)
+    
+    inventory = Inventory(**structure, storage_mode=storage_mode)
+    await insert_inventory(inventory)
+    return inventory
+
+# Inventory templates
+@api_router.post("/templates", response_model=InventoryTemplate)
+async def create_template(template_data: TemplateCreate):
+    template_dict = template_data.model_dump(exclude={"source_inventory_id"})
+    if template_data.source_inventory_id:
+        conflicting = {"rooms", "health_safety"} & template_data.model_fields_set
+        if conflicting:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{', '.join(sorted(conflicting))} cannot be combined with source_inventory_id"
+            )
+        source = await load_inventory({"id": template_data.source_inventory_id})
+        if not source:
+            raise HTTPException(status_code=404, detail="Inventory not found")
+        structure = clone_structure(source)
+        if template_data.property_overview:
+            structure["property_overview"] = template_data.property_overview.model_dump()
+        template_dict.update(structure)
+    
+    template = InventoryTemplate(**template_dict)
+    await db.inventory_templates.insert_one(template.model_dump())
+    return template
+
+@api_router.get("/templates", response_model=List[InventoryTemplate])
+async def get_templates():
+    templates = await db.inventory_templates.find({}, {"_id": 0}).to_list(1000)
+    return templates
+
+@api_router.get("/templates/{template_id}", response_model=InventoryTemplate)
+async def get_template(template_id: str):
+    template = await db.inventory_templates.find_one({"id": template_id}, {"_id": 0})
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+@api_router.delete("/templates/{template_id}")
+async def delete_template(template_id: str):
+    result = await db.inventory_templates.delete_one({"id": template_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return {"message": "Template deleted successfully"}
+
 # File Upload
 @api_router.post("/upload/photo")
 async def upload_photo(file: UploadFile = File(...), room_reference: str = Form(...), description: str = Form("")):
@@ -194,7 +807,7 @@ async def upload_photo(file: UploadFile = File(...), room_reference: str = Form(
     file_path = PHOTOS_DIR / unique_filename
     
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
     
     # Get current timestamp
     timestamp = datetime.now(timezone.utc)
@@ -217,7 +830,7 @@ async def upload_document(file: UploadFile = File(...)):
     file_path = DOCUMENTS_DIR / unique_filename
     
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
     
     return {
         "file_path": f"/uploads/documents/{unique_filename}",
@@ -232,13 +845,22 @@ async def upload_property_photo(file: UploadFile = File(...)):
     file_path = PROPERTY_PHOTOS_DIR / unique_filename
     
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
     
     return {
         "file_path": f"/uploads/property_photos/{unique_filename}",
         "original_filename": file.filename
     }
 
+@api_router.get("/status/uploads")
+async def get_upload_status(request: Request):
+    peer = request.client.host if request.client else "unknown"
+    return {
+        **upload_admission.status(),
+        "client_id": get_client_id(request),
+        "via_trusted_proxy": bool(request.headers.get("x-forwarded-for")) and is_trusted_proxy(peer),
+    }
+
 # Serve uploaded files
 @api_router.get("/uploads/{file_type}/{filename}")
 async def get_uploaded_file(file_type: str, filename: str):
@@ -247,6 +869,166 @@ async def get_uploaded_file(file_type: str, filename: str):
         raise HTTPException(status_code=404, detail="File not found")
     return FileResponse(file_path)
 
+# Evidence bundle export
+BUNDLE_CHUNK_SIZE = 64 * 1024
+# Formats that are already compressed; deflating them only burns CPU
+STORED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp", "heic", "pdf", "docx", "xlsx", "zip"}
+
+class ZipChunkWriter:
+    """Write-only, non-seekable sink that hands finished bytes to a generator.
+
+    zipfile falls back to data descriptors when the target cannot seek, so the
+    archive is produced front to back without temp files.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+SIGNATURE_DATA_URL = re.compile(r"^data:image/([A-Za-z0-9.+-]+)[;,]")
+SIGNATURE_EXTENSIONS = {"jpeg": "jpg", "svg+xml": "svg"}
+
+def signature_extension(signature_data: str) -> str:
+    match = SIGNATURE_DATA_URL.match(signature_data)
+    if not match:
+        return "png"
+    subtype = match.group(1).lower()
+    return SIGNATURE_EXTENSIONS.get(subtype, safe_archive_name(subtype))
+
+def safe_archive_name(name: str) -> str:
+    cleaned = re.sub(r"[^A-Za-z0-9._ -]+", "_", name or "").strip(" .")
+    return cleaned or "untitled"
+
+def resolve_upload_path(file_path: Optional[str]) -> Optional[Path]:
+    """Map a stored '/uploads/<type>/<file>' reference to a file on disk."""
+    if not file_path:
+        return None
+    relative = file_path.split("/uploads/", 1)[-1].lstrip("/")
+    candidate = (UPLOADS_DIR / relative).resolve()
+    if UPLOADS_DIR.resolve() not in candidate.parents or not candidate.is_file():
+        return None
+    return candidate
+
+def collect_bundle_files(inventory: Dict[str, Any]) -> List[tuple]:
+    """List (source path, archive name) pairs for every file an inventory references."""
+    entries = []
+    seen = set()
+
+    def add(file_path, folder, prefix=""):
+        source = resolve_upload_path(file_path)
+        # A file shared between sections (e.g. property and room) goes in each folder
+        if source is None or (source, folder) in seen:
+            return
+        seen.add((source, folder))
+        name = f"{safe_archive_name(prefix)}_{source.name}" if prefix else source.name
+        entries.append((source, f"{folder}/{name}"))
+
+    overview = inventory.get("property_overview") or {}
+    for photo in overview.get("property_photos", []):
+        add(photo, "property")
+
+    health_safety = inventory.get("health_safety") or {}
+    for meter in health_safety.get("meters", []):
+        add(meter.get("photo"), "health_safety/meters", meter.get("meter_type", ""))
+    for safety_item in health_safety.get("safety_items", []):
+        add(safety_item.get("photo"), "health_safety/safety_items", safety_item.get("item_type", ""))
+    for document in health_safety.get("compliance_documents", []):
+        add(document, "compliance")
+
+    room_folders = {}
+    for index, room in enumerate(inventory.get("rooms", []), start=1):
+        folder = f"rooms/{index:02d}_{safe_archive_name(room.get('room_name'))}"
+        room_folders.setdefault(room.get("room_name"), folder)
+        for item in room.get("items", []):
+            for photo in item.get("photos", []):
+                add(photo, folder, item.get("item_name", ""))
+
+    for photo in inventory.get("photo_vault", []):
+        room_reference = photo.get("room_reference")
+        folder = room_folders.get(room_reference) or f"rooms/{safe_archive_name(room_reference)}"
+        add(photo.get("file_path"), folder)
+
+    return entries
+
+def iter_inventory_bundle(inventory: Dict[str, Any]):
+    sink = ZipChunkWriter()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("inventory.json", json.dumps(inventory, indent=2, default=str))
+        yield sink.drain()
+
+        # Files can vanish or change after the inventory was read; skip them
+        # rather than abort a response that has already started streaming
+        missing = []
+        for source, arcname in collect_bundle_files(inventory):
+            try:
+                src = open(source, "rb")
+                stat = os.fstat(src.fileno())
+            except OSError:
+                missing.append(arcname)
+                continue
+            with src:
+                info = zipfile.ZipInfo(arcname, date_time=datetime.fromtimestamp(stat.st_mtime).timetuple()[:6])
+                info.file_size = stat.st_size
+                extension = source.suffix.lower().lstrip(".")
+                info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                try:
+                    with archive.open(info, mode="w") as dest:
+                        while True:
+                            chunk = src.read(BUNDLE_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            dest.write(chunk)
+                            yield sink.drain()
+                except OSError:
+                    missing.append(f"{arcname} (truncated: read failed)")
+            yield sink.drain()
+
+        if missing:
+            archive.writestr("missing.txt", "Files referenced by the inventory that could not be read:\n" + "\n".join(missing) + "\n")
+            yield sink.drain()
+
+        signatures = (inventory.get("signature") or {}).get("signatures", [])
+        for index, entry in enumerate(signatures, start=1):
+            signature_data = entry.get("signature_data") or ""
+            extension = signature_extension(signature_data)
+            if "," in signature_data:
+                signature_data = signature_data.split(",", 1)[1]
+            try:
+                image = base64.b64decode(signature_data, validate=True)
+            except ValueError:
+                continue
+            if not image:
+                continue
+            name = safe_archive_name(f"{index:02d}_{entry.get('signer_role', '')}_{entry.get('signer_name', '')}")
+            info = zipfile.ZipInfo(f"signatures/{name}.{extension}", date_time=datetime.now(timezone.utc).timetuple()[:6])
+            archive.writestr(info, image, compress_type=zipfile.ZIP_STORED)
+            yield sink.drain()
+    yield sink.drain()
+
+@api_router.get("/inventories/{inventory_id}/bundle.zip")
+async def export_inventory_bundle(inventory_id: str):
+    inventory = await load_inventory({"id": inventory_id})
+    if not inventory:
+        raise HTTPException(status_code=404, detail="Inventory not found")
+
+    filename = f"inventory-{inventory_id}.zip"
+    return StreamingResponse(
+        iter_inventory_bundle(inventory),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 # Generate Shareable Link
 @api_router.post("/inventories/{inventory_id}/generate-link")
 async def generate_shareable_link(inventory_id: str):
@@ -267,7 +1049,7 @@ async def generate_shareable_link(inventory_id: str):
 # Get Inventory by Shareable Link
 @api_router.get("/sign/{token}", response_model=Inventory)
 async def get_inventory_by_token(token: str):
-    inventory = await db.inventories.find_one({"shareable_link": token}, {"_id": 0})
+    inventory = await load_inventory({"shareable_link": token})
     if not inventory:
         raise HTTPException(status_code=404, detail="Invalid or expired link")
     return inventory
@@ -367,6 +1149,42 @@ async def get_predefined_rooms():
 # Include router
 app.include_router(api_router)
 
+@app.middleware("http")
+async def upload_admission_control(request: Request, call_next):
+    path = request.url.path
+    if not path.startswith("/api/"):
+        return await call_next(request)
+
+    if path == UPLOAD_STATUS_PATH:
+        return await call_next(request)
+
+    if not path.startswith(UPLOAD_PATH_PREFIX):
+        await upload_admission.interactive_started()
+        try:
+            return await call_next(request)
+        finally:
+            await upload_admission.interactive_finished()
+
+    # Reject oversized bodies before reading any of them; without a length
+    # (chunked transfer) the size cannot be bounded up front
+    content_length = request.headers.get("content-length")
+    if not content_length or not content_length.isdigit():
+        return upload_rejected(411, "Content-Length header is required for uploads")
+    if int(content_length) > UPLOAD_MAX_BYTES:
+        return upload_rejected(413, f"Upload exceeds maximum size of {UPLOAD_MAX_BYTES} bytes")
+
+    client_id = get_client_id(request)
+    rejection = upload_admission.rejection(client_id)
+    if rejection:
+        return upload_rejected(429, rejection)
+
+    if not await upload_admission.acquire(client_id):
+        return upload_rejected(503, "Upload queue wait timed out")
+    try:
+        return await call_next(request)
+    finally:
+        await upload_admission.release(client_id)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -381,6 +1199,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_storage_indexes():
+    await db.inventories.create_index("id")
+    await db.inventories.create_index("shareable_link")
+    await db.inventory_rooms.create_index([("inventory_id", 1), ("position", 1)], unique=True)
+    await db.inventory_items.create_index([("inventory_id", 1), ("room_position", 1), ("position", 1)], unique=True)
+    await db.inventory_photos.create_index([("inventory_id", 1), ("position", 1)], unique=True)
+    await db.inventory_templates.create_index("id")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
@@ -4,6 +4,11 @@ import json
 from datetime import datetime
 import os
 import tempfile
+import time
+import io
+import zipfile
+import http.client
+from urllib.parse import urlparse
 
 class InventoryAPITester:
     def __init__(self, base_url="https://inventory-manager-156.preview.emergentagent.com"):
@@ -138,6 +143,69 @@ class InventoryAPITester:
             return True
         return False
 
+    def test_normalized_storage(self):
+        """Test normalized storage mode with lazy per-room access"""
+        inventory_data = {
+            "property_overview": {
+                "address": "45 Normalized Street, Test City",
+                "property_type": "HMO",
+                "landlord_name": "Test Landlord",
+                "tenant_names": ["Test Tenant"],
+                "inspection_date": "2024-01-15"
+            },
+            "rooms": [
+                {"room_name": "Kitchen", "items": [{"item_name": "Walls", "condition": "Good"}]},
+                {"room_name": "Bedroom 1", "items": []}
+            ],
+            "storage_mode": "normalized"
+        }
+        
+        success, response = self.run_test("Create Normalized Inventory", "POST", "inventories", 200, inventory_data)
+        if not success or response.get('storage_mode') != "normalized":
+            return False
+        inventory_id = response['id']
+        
+        success, response = self.run_test("Get Normalized Inventory", "GET", f"inventories/{inventory_id}", 200)
+        if not success or [room['room_name'] for room in response['rooms']] != ["Kitchen", "Bedroom 1"]:
+            print("   Rooms were not assembled on read")
+            return False
+        
+        success, response = self.run_test("List Inventory Rooms", "GET", f"inventories/{inventory_id}/rooms", 200)
+        if not success or response[0]['item_count'] != 1:
+            return False
+        
+        room_update = {"room_name": "Bedroom 1", "items": [{"item_name": "Carpet", "condition": "Fair"}]}
+        success, response = self.run_test("Update Single Room", "PUT", f"inventories/{inventory_id}/rooms/1", 200, room_update)
+        if not success:
+            return False
+        
+        success, response = self.run_test("Get Single Room", "GET", f"inventories/{inventory_id}/rooms/1", 200)
+        if not success or response['items'][0]['item_name'] != "Carpet":
+            return False
+        
+        success, response = self.run_test("List Inventory Summaries", "GET", "inventories?summary=true", 200)
+        summary = next((inv for inv in response if inv['id'] == inventory_id), None) if success else None
+        if not summary or summary['room_count'] != 2 or summary['rooms']:
+            print("   Summary listing should omit rooms and report room_count")
+            return False
+        
+        success, response = self.run_test("Migrate To Embedded", "PUT", f"inventories/{inventory_id}/storage", 200, {"storage_mode": "embedded"})
+        if not success or response['storage_mode'] != "embedded" or response['rooms'][1]['items'][0]['item_name'] != "Carpet":
+            print("   Rooms were not preserved when migrating to embedded storage")
+            return False
+        
+        success, response = self.run_test("Migrate To Normalized", "PUT", f"inventories/{inventory_id}/storage", 200, {"storage_mode": "normalized"})
+        if not success or response['storage_mode'] != "normalized" or [room['room_name'] for room in response['rooms']] != ["Kitchen", "Bedroom 1"]:
+            print("   Rooms were not preserved when migrating back to normalized storage")
+            return False
+        
+        success, _ = self.run_test("Reject Unknown Storage Mode", "PUT", f"inventories/{inventory_id}/storage", 400, {"storage_mode": "sharded"})
+        if not success:
+            return False
+        
+        success, _ = self.run_test("Delete Normalized Inventory", "DELETE", f"inventories/{inventory_id}", 200)
+        return success
+
     def test_file_uploads(self):
         """Test file upload endpoints"""
         # Create a test image file
@@ -164,6 +232,217 @@ class InventoryAPITester:
         
         return success
 
+    def open_stalled_upload(self, content_length):
+        """Start an upload that sends headers but no body, holding an admission slot"""
+        parsed = urlparse(self.base_url)
+        connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(parsed.netloc, timeout=30)
+        connection.putrequest("POST", "/api/upload/document")
+        connection.putheader("Content-Type", "multipart/form-data; boundary=stalled")
+        connection.putheader("Content-Length", str(content_length))
+        connection.endheaders()
+        return connection
+
+    def test_upload_admission(self):
+        """Test upload admission control: status shape, 413 and per-client 429"""
+        success, status = self.run_test("Upload Queue Status", "GET", "status/uploads", 200)
+        expected_keys = {"active", "queued", "interactive_in_flight", "current_limit",
+                         "max_concurrent", "max_per_client", "max_queue", "max_bytes",
+                         "client_id", "via_trusted_proxy"}
+        if not success or not expected_keys.issubset(status):
+            print(f"   Unexpected status shape: {status}")
+            return False
+        if status["interactive_in_flight"] != 0:
+            print("   Status request was counted as interactive traffic")
+            return False
+        
+        # Oversized Content-Length is rejected before the body is read
+        self.tests_run += 1
+        print(f"\n🔍 Testing Oversized Upload Rejection...")
+        request = requests.Request(
+            "POST", f"{self.api_url}/upload/document",
+            files={'file': ('big.pdf', b"small body", 'application/pdf')}
+        ).prepare()
+        request.headers["Content-Length"] = str(status["max_bytes"] + 1)
+        try:
+            response = requests.Session().send(request)
+            status_code = response.status_code
+        except requests.exceptions.ConnectionError:
+            status_code = None
+        if status_code != 413:
+            print(f"❌ Failed - Expected 413, got {status_code}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - Status: 413")
+        
+        # Hold every per-client slot, then one more upload must be turned away.
+        # This relies on stalled uploads reaching the backend before their body
+        # arrives; a proxy that buffers request bodies (as ingresses usually do)
+        # never forwards them, so the check only runs against a direct backend.
+        if status["via_trusted_proxy"]:
+            print("   Skipping per-client 429 check: requests arrive through a proxy")
+            return True
+        self.tests_run += 1
+        print(f"\n🔍 Testing Per-Client Upload Limit...")
+        stalled = [self.open_stalled_upload(1024) for _ in range(status["max_per_client"])]
+        time.sleep(1)  # let the stalled uploads reach admission
+        try:
+            files = {'file': ('test_doc.pdf', b"fake pdf content", 'application/pdf')}
+            response = requests.post(f"{self.api_url}/upload/document", files=files)
+        finally:
+            for connection in stalled:
+                connection.close()
+        if response.status_code != 429 or "Retry-After" not in response.headers:
+            print(f"❌ Failed - Expected 429 with Retry-After, got {response.status_code}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - Status: 429, Retry-After: {response.headers['Retry-After']}")
+        return True
+
+    def test_bundle_export(self):
+        """Test streaming ZIP evidence bundle export"""
+        if not self.test_inventory_id:
+            print("❌ No inventory ID available for testing")
+            return False
+        
+        # Put a photo in a room so the bundle has something to group
+        data = {'room_reference': 'Living Room', 'description': 'Bundle photo'}
+        files = {'file': ('bundle_photo.jpg', b"fake image content for bundle", 'image/jpeg')}
+        success, photo = self.run_test("Upload Bundle Photo", "POST", "upload/photo", 200, data, files)
+        if not success:
+            return False
+        photo_name = photo['file_path'].split("/")[-1]
+        rooms = [{"room_name": "Living Room", "items": [
+            {"item_name": "Walls", "condition": "Good", "photos": [photo['file_path']]}
+        ]}]
+        success, _ = self.run_test("Add Room With Photo", "PUT", f"inventories/{self.test_inventory_id}", 200, {"rooms": rooms})
+        if not success:
+            return False
+        
+        self.tests_run += 1
+        print(f"\n🔍 Testing Evidence Bundle Export...")
+        response = requests.get(f"{self.api_url}/inventories/{self.test_inventory_id}/bundle.zip")
+        if response.status_code != 200:
+            print(f"❌ Failed - Expected 200, got {response.status_code}")
+            return False
+        
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(response.content))
+            names = archive.namelist()
+            if "inventory.json" not in names or archive.testzip() is not None:
+                print(f"❌ Failed - Invalid bundle contents: {names}")
+                return False
+            bundled = json.loads(archive.read("inventory.json"))
+            if bundled.get("id") != self.test_inventory_id:
+                print("❌ Failed - Bundle is for a different inventory")
+                return False
+            photo_entries = [info for info in archive.infolist() if info.filename.endswith(photo_name)]
+            if len(photo_entries) != 1 or not photo_entries[0].filename.startswith("rooms/01_Living Room/"):
+                print(f"❌ Failed - Room photo not grouped under rooms/01_Living Room/: {names}")
+                return False
+            if photo_entries[0].compress_type != zipfile.ZIP_STORED:
+                print("❌ Failed - JPEG entry should be stored, not deflated")
+                return False
+        except zipfile.BadZipFile as e:
+            print(f"❌ Failed - Not a valid ZIP: {str(e)}")
+            return False
+        
+        self.tests_passed += 1
+        print(f"✅ Passed - {len(names)} entries in bundle")
+        return True
+
+    def without_photos(self, rooms):
+        """Room structure with photo references stripped, for comparing clones"""
+        return [
+            {**room, "items": [{**item, "photos": []} for item in room.get("items", [])]}
+            for room in rooms
+        ]
+
+    def test_clone_and_templates(self):
+        """Test cloning from an inventory and from a saved template"""
+        if not self.test_inventory_id:
+            print("❌ No inventory ID available for testing")
+            return False
+        
+        # Give the source meters, safety items and a room photo to copy
+        data = {'room_reference': 'Kitchen', 'description': 'Clone photo'}
+        files = {'file': ('clone_photo.jpg', b"fake image content for clone", 'image/jpeg')}
+        success, photo = self.run_test("Upload Clone Photo", "POST", "upload/photo", 200, data, files)
+        if not success:
+            return False
+        source_update = {
+            "health_safety": {
+                "meters": [{"meter_type": "Gas", "serial_number": "G123", "location": "Under stairs"}],
+                "safety_items": [{"item_type": "smoke_alarm", "location": "Hallway", "count": 2}],
+                "compliance_documents": []
+            },
+            "rooms": [{"room_name": "Kitchen", "general_notes": "Galley kitchen", "items": [
+                {"item_name": "Worktops", "condition": "Good", "photos": [photo['file_path']]},
+                {"item_name": "Oven", "condition": "Fair", "description": "Light soiling"}
+            ]}]
+        }
+        success, source = self.run_test("Prepare Clone Source", "PUT", f"inventories/{self.test_inventory_id}", 200, source_update)
+        if not success:
+            return False
+        
+        clone_data = {"source_inventory_id": self.test_inventory_id}
+        success, response = self.run_test("Clone Inventory", "POST", "inventories/clone", 200, clone_data)
+        if not success or response.get('id') == self.test_inventory_id or response.get('status') != "draft":
+            return False
+        clone_id = response['id']
+        if response['rooms'] != source['rooms']:
+            print("   Cloned rooms and items do not match the source")
+            return False
+        if (response['health_safety']['meters'] != source['health_safety']['meters']
+                or response['health_safety']['safety_items'] != source['health_safety']['safety_items']):
+            print("   Cloned meters or safety items do not match the source")
+            return False
+        if response['property_overview']['tenant_names']:
+            print("   Previous tenants were carried into the clone")
+            return False
+        
+        clone_data = {"source_inventory_id": self.test_inventory_id, "photo_mode": "hardlink"}
+        success, response = self.run_test("Clone Inventory With Hardlinks", "POST", "inventories/clone", 200, clone_data)
+        if not success:
+            return False
+        hardlink_clone_id = response['id']
+        cloned_photos = response['rooms'][0]['items'][0]['photos']
+        if self.without_photos(response['rooms']) != self.without_photos(source['rooms']) or len(cloned_photos) != 1:
+            print("   Hardlinked clone structure does not match the source")
+            return False
+        if cloned_photos[0] == photo['file_path']:
+            print("   Hardlinked clone still points at the source photo")
+            return False
+        linked = requests.get(f"{self.api_url}{cloned_photos[0]}")
+        if linked.status_code != 200 or linked.content != b"fake image content for clone":
+            print(f"   Hardlinked photo is not readable: {linked.status_code}")
+            return False
+        
+        template_data = {"name": "Test Template", "source_inventory_id": self.test_inventory_id}
+        success, response = self.run_test("Create Template", "POST", "templates", 200, template_data)
+        if not success:
+            return False
+        template_id = response['id']
+        
+        success, response = self.run_test("Get Templates", "GET", "templates", 200)
+        if not success or template_id not in [template['id'] for template in response]:
+            return False
+        
+        clone_data = {"template_id": template_id, "photo_mode": "none"}
+        success, response = self.run_test("Clone From Template", "POST", "inventories/clone", 200, clone_data)
+        if not success:
+            return False
+        template_clone_id = response['id']
+        if response['rooms'] != self.without_photos(source['rooms']):
+            print("   Template clone structure does not match the source")
+            return False
+        
+        self.run_test("Delete Template", "DELETE", f"templates/{template_id}", 200)
+        self.run_test("Delete Clone", "DELETE", f"inventories/{clone_id}", 200)
+        self.run_test("Delete Hardlink Clone", "DELETE", f"inventories/{hardlink_clone_id}", 200)
+        self.run_test("Delete Template Clone", "DELETE", f"inventories/{template_clone_id}", 200)
+        return True
+
     def test_generate_shareable_link(self):
         """Test generating shareable link"""
         if not self.test_inventory_id:
@@ -329,7 +608,11 @@ def main():
         tester.test_get_inventories,
         tester.test_get_inventory_by_id,
         tester.test_update_inventory,
+        tester.test_normalized_storage,
         tester.test_file_uploads,
+        tester.test_upload_admission,
+        tester.test_bundle_export,
+        tester.test_clone_and_templates,
         tester.test_generate_shareable_link,
         tester.test_get_inventory_by_token,
         tester.test_signature_workflow,  # New comprehensive signature workflow test
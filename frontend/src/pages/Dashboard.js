@@ -27,7 +27,7 @@ const Dashboard = () => {
 
   const fetchInventories = async () => {
     try {
-      const response = await axios.get(`${API}/inventories`);
+      const response = await axios.get(`${API}/inventories?summary=true`);
       setInventories(response.data);
       setFilteredInventories(response.data);
       setLoading(false);